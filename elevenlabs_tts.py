@@ -4,15 +4,194 @@ Premium voice synthesis for your apps - HealthAIde, StorySpark, dentist assistan
 """
 
 import os
+import re
+import json
+import time
+import base64
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import AsyncIterator, List
+import httpx
+import websockets
 from elevenlabs.client import ElevenLabs
 
 
+WS_STREAM_INPUT_URL = "wss://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream-input"
+
+# Write buffer for streamed audio; coalesces small network chunks into few syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _write_all(f, data):
+    """Write data to an unbuffered file, retrying on partial writes."""
+    view = memoryview(data)
+    while view:
+        written = f.write(view)
+        view = view[written:]
+
+
+def _write_chunks(chunks, output_path: str, buffer_size: int = WRITE_BUFFER_SIZE):
+    """Write streamed audio chunks to a file through one pre-allocated buffer.
+    
+    Chunks are copied into a reusable bytearray and flushed when it fills,
+    so there is no per-chunk allocation and only a few write() syscalls.
+    """
+    buf = bytearray(buffer_size)
+    mv = memoryview(buf)
+    offset = 0
+    
+    with open(output_path, "wb", buffering=0) as f:
+        for chunk in chunks:
+            size = len(chunk)
+            if offset + size > buffer_size:
+                _write_all(f, mv[:offset])
+                offset = 0
+            if size >= buffer_size:
+                _write_all(f, chunk)
+                continue
+            mv[offset:offset + size] = chunk
+            offset += size
+        
+        if offset:
+            _write_all(f, mv[:offset])
+
+
+def _latency_level(optimize_streaming_latency: int, apply_text_normalization: str) -> int:
+    """Resolve the optimize_streaming_latency level sent to ElevenLabs."""
+    if optimize_streaming_latency is None:
+        return 4 if apply_text_normalization == "off" else 3
+    return optimize_streaming_latency
+
+
+class SentenceBuffer:
+    """Group streamed LLM tokens into whole sentences for TTS.
+    
+    A sentence ends at ``.``, ``!`` or ``?`` followed by whitespace. Common
+    abbreviations (Dr., Mr., Mrs., PM., ...) are not treated as endings, and
+    decimals like 3.5 never match because the dot is not followed by a space.
+    Sentences shorter than ``min_length`` are merged into the next one.
+    
+    Each character is scanned once: a feed only scans the newly added text
+    (plus any trailing punctuation still waiting for its whitespace).
+    """
+    
+    _BOUNDARY = re.compile(
+        r"(?<!\bDr)(?<!\bMr)(?<!\bMrs)(?<!\bMs)(?<!\bSt)(?<!\bAM)(?<!\bPM)"
+        r"[.!?]+(?=\s)"
+    )
+    
+    def __init__(self, min_length: int = 10):
+        self.min_length = min_length
+        self._buffer = ""
+        self._scan_pos = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return any sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        
+        for match in self._BOUNDARY.finditer(self._buffer, self._scan_pos):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) < self.min_length:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        
+        self._buffer = self._buffer[start:]
+        
+        # Resume at a trailing run of terminators, which may still become a
+        # boundary once whitespace arrives; everything before it is settled
+        pos = len(self._buffer)
+        while pos and self._buffer[pos - 1] in ".!?":
+            pos -= 1
+        self._scan_pos = pos
+        return sentences
+    
+    def flush(self) -> List[str]:
+        """Return whatever text remains once the stream has ended."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        self._scan_pos = 0
+        return [remainder] if remainder else []
+    
+    async def aiter_sentences(self, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Turn an async stream of tokens into an async stream of sentences."""
+        async for token in tokens:
+            for sentence in self.feed(token):
+                yield sentence
+        for sentence in self.flush():
+            yield sentence
+
+
 class ElevenLabsTTS:
-    """ElevenLabs premium voice handler for high-quality TTS."""
+    """ElevenLabs premium voice handler for high-quality TTS.
+    
+    Holds a persistent keep-alive HTTP connection pool, so create one
+    instance per process and reuse it instead of constructing one per call.
+    With eager_connect, build it well before the first call so the warm-up
+    can finish in time.
+    """
     
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        max_connections: int = 32,
+        default_voice_id: str = None,
+        voices_ttl: float = None,
+        cache_dir: str = None,
+        use_cache: bool = True,
+        eager_connect: bool = True
+    ):
         self.api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
-        self.client = ElevenLabs(api_key=self.api_key)
+        # Synthesized audio is cached on disk by content hash
+        self.use_cache = use_cache
+        self.cache_dir = Path(
+            cache_dir or os.getenv("TTS_CACHE", "~/.cache/elevenlabs_tts")
+        ).expanduser()
+        self._default_voice_id = default_voice_id
+        # Seconds to cache list_voices() results; None disables caching
+        self.voices_ttl = voices_ttl
+        self._voices_cache = None
+        self._voices_cached_at = 0.0
+        self._http = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=300,
+            ),
+            timeout=30,
+        )
+        self.client = ElevenLabs(api_key=self.api_key, httpx_client=self._http)
+        
+        if eager_connect:
+            # Open the connection (DNS + TLS) off the critical path
+            threading.Thread(target=self._warm_up, daemon=True).start()
+    
+    def _warm_up(self):
+        """Issue a cheap request so the connection pool is ready for real calls."""
+        try:
+            self.client.models.list()
+        except Exception:
+            pass
+    
+    def close(self):
+        """Close the underlying HTTP connection pool."""
+        http = getattr(self, "_http", None)
+        if http is not None:
+            http.close()
+            self._http = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
     
     def text_to_speech(
         self,
@@ -20,16 +199,24 @@ class ElevenLabsTTS:
         output_path: str = "output.mp3",
         voice_id: str = None,
         model_id: str = "eleven_turbo_v2_5",
-        output_format: str = "mp3_44100_128"
+        output_format: str = "mp3_44100_128",
+        optimize_streaming_latency: int = None,
+        apply_text_normalization: str = "auto"
     ) -> str:
         """Convert text to premium speech audio.
         
+        Audio is requested from the streaming endpoint, so bytes are written
+        to disk as soon as ElevenLabs starts generating them.
+        
         Args:
             text: Text to convert to speech
             output_path: Where to save the audio file
             voice_id: ElevenLabs voice ID from your dashboard
             model_id: Model to use (eleven_turbo_v2_5, eleven_multilingual_v2, etc.)
             output_format: Format (mp3_44100_128, pcm_44100, etc.)
+            optimize_streaming_latency: Latency optimization level (0-4).
+                Defaults to 3, or 4 when text normalization is turned off.
+            apply_text_normalization: Text normalizer mode (auto, on, off)
         
         Returns:
             Path to saved audio file
@@ -38,30 +225,203 @@ class ElevenLabsTTS:
         if not voice_id:
             voice_id = self.get_default_voice()
         
-        audio = self.client.text_to_speech.convert(
+        # The latency level changes the audio, so resolve it before keying the cache
+        optimize_streaming_latency = _latency_level(
+            optimize_streaming_latency, apply_text_normalization
+        )
+        
+        cache_path = None
+        if self.use_cache:
+            cache_path = self._cache_path(
+                text, voice_id, model_id, output_format,
+                apply_text_normalization, optimize_streaming_latency
+            )
+            if cache_path.exists():
+                # Copy rather than hardlink, so later writes to output_path
+                # can never modify the cached file
+                shutil.copyfile(cache_path, output_path)
+                return output_path
+        
+        audio = self._stream(
+            text=text,
             voice_id=voice_id,
             model_id=model_id,
-            text=text,
             output_format=output_format,
+            optimize_streaming_latency=optimize_streaming_latency,
+            apply_text_normalization=apply_text_normalization,
         )
         
-        with open(output_path, "wb") as f:
-            for chunk in audio:
-                f.write(chunk)
+        if cache_path is None:
+            _write_chunks(audio, output_path)
+            return output_path
+        
+        # Write to a temp file and rename, so a failed stream never leaves
+        # a truncated entry in the cache
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            _write_chunks(audio, tmp_path)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
         
+        shutil.copyfile(cache_path, output_path)
         return output_path
     
+    def _cache_path(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str,
+        output_format: str,
+        apply_text_normalization: str,
+        optimize_streaming_latency: int
+    ) -> Path:
+        """Content-addressed cache location for a synthesis request."""
+        key = hashlib.sha256(
+            f"{voice_id}|{model_id}|{output_format}|{apply_text_normalization}"
+            f"|{optimize_streaming_latency}|{text}".encode()
+        ).hexdigest()
+        ext = output_format.split("_", 1)[0]
+        return self.cache_dir / f"{key}.{ext}"
+    
+    def _stream(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str,
+        output_format: str,
+        optimize_streaming_latency: int = None,
+        apply_text_normalization: str = "auto"
+    ):
+        """Call the ElevenLabs streaming endpoint and return the chunk iterator."""
+        optimize_streaming_latency = _latency_level(
+            optimize_streaming_latency, apply_text_normalization
+        )
+        
+        return self.client.text_to_speech.stream(
+            voice_id=voice_id,
+            model_id=model_id,
+            text=text,
+            output_format=output_format,
+            optimize_streaming_latency=optimize_streaming_latency,
+            apply_text_normalization=apply_text_normalization,
+        )
+    
+    async def text_to_speech_ws_stream(
+        self,
+        text_iter: AsyncIterator[str],
+        voice_id: str = None,
+        model_id: str = "eleven_turbo_v2_5",
+        output_format: str = "mp3_44100_128",
+        voice_settings: dict = None
+    ) -> AsyncIterator[bytes]:
+        """Synthesize text as it is produced, over the input-streaming WebSocket.
+        
+        Text is forwarded to ElevenLabs while it is still being generated
+        (e.g. by an LLM), so audio starts before the full text exists. Feed
+        whole words or sentences - see SentenceBuffer.aiter_sentences().
+        
+        Args:
+            text_iter: Async iterator of text pieces
+            voice_id: ElevenLabs voice ID from your dashboard
+            model_id: Model to use (eleven_turbo_v2_5, eleven_multilingual_v2, etc.)
+            output_format: Format (mp3_44100_128, pcm_44100, etc.)
+            voice_settings: Optional voice settings (stability, similarity_boost, ...)
+        
+        Returns:
+            Async generator yielding audio chunks
+        """
+        if not voice_id:
+            # The lookup is a blocking HTTPS call; keep it off the event loop
+            voice_id = await asyncio.to_thread(self.get_default_voice)
+        
+        uri = (
+            WS_STREAM_INPUT_URL.format(voice_id=voice_id)
+            + f"?model_id={model_id}&output_format={output_format}"
+        )
+        
+        async with websockets.connect(uri) as ws:
+            await ws.send(json.dumps({
+                "text": " ",
+                "voice_settings": voice_settings or {"stability": 0.5, "similarity_boost": 0.8},
+                "xi_api_key": self.api_key,
+            }))
+            
+            async def send_text():
+                async for text in text_iter:
+                    if not text:
+                        continue
+                    # ElevenLabs expects every text piece to end with a space
+                    if not text.endswith(" "):
+                        text += " "
+                    await ws.send(json.dumps({"text": text}))
+                # Empty text closes the input stream
+                await ws.send(json.dumps({"text": ""}))
+            
+            sender = asyncio.create_task(send_text())
+            receiver = None
+            try:
+                while True:
+                    if receiver is None:
+                        receiver = asyncio.create_task(ws.recv())
+                    # Watch the sender too, so a failing text_iter aborts the
+                    # stream instead of waiting for the server's idle timeout
+                    waiting = {receiver} if sender.done() else {receiver, sender}
+                    done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                    if sender in done:
+                        # Re-raises any text_iter error; leaving the context closes the socket
+                        sender.result()
+                    if receiver not in done:
+                        continue
+                    
+                    try:
+                        message = receiver.result()
+                    except websockets.ConnectionClosedOK:
+                        break
+                    receiver = None
+                    
+                    data = json.loads(message)
+                    if data.get("audio"):
+                        yield base64.b64decode(data["audio"])
+                    if data.get("isFinal"):
+                        break
+                await sender
+            finally:
+                for task in (sender, receiver):
+                    if task is not None and not task.done():
+                        task.cancel()
+    
     def get_default_voice(self) -> str:
-        """Get the first available voice ID from your account."""
+        """Get the first available voice ID from your account.
+        
+        The lookup is done at most once per instance.
+        """
+        if self._default_voice_id:
+            return self._default_voice_id
+        
         voices = self.client.voices.get_all()
         if voices.voices:
-            return voices.voices[0].voice_id
+            self._default_voice_id = voices.voices[0].voice_id
+            return self._default_voice_id
         raise ValueError("No voices available in your ElevenLabs account")
     
     def list_voices(self) -> list:
-        """List all available voices in your account."""
+        """List all available voices in your account.
+        
+        Results are cached for ``voices_ttl`` seconds when it is set.
+        """
+        if (
+            self.voices_ttl is not None
+            and self._voices_cache is not None
+            and time.monotonic() - self._voices_cached_at < self.voices_ttl
+        ):
+            return list(self._voices_cache)
+        
         voices = self.client.voices.get_all()
-        return [
+        result = [
             {
                 "voice_id": v.voice_id,
                 "name": v.name,
@@ -69,34 +429,63 @@ class ElevenLabsTTS:
             }
             for v in voices.voices
         ]
+        
+        if self.voices_ttl is not None:
+            self._voices_cache = result
+            self._voices_cached_at = time.monotonic()
+        return result
     
     def text_to_speech_streaming(
         self,
         text: str,
         voice_id: str = None,
-        model_id: str = "eleven_turbo_v2_5"
+        model_id: str = "eleven_turbo_v2_5",
+        optimize_streaming_latency: int = None,
+        apply_text_normalization: str = "auto",
+        output_format: str = "mp3_22050_32"
     ):
         """Stream audio generation (for real-time playback).
         
+        Defaults to mp3_22050_32, about a quarter of the bytes of
+        mp3_44100_128. Speech stays clear for voice-assistant playback but
+        loses some high-end detail; pass mp3_44100_128 for music-grade
+        quality, or use text_to_speech() for archive files.
+        
+        Args:
+            optimize_streaming_latency: Latency optimization level (0-4).
+                Defaults to 3, or 4 when text normalization is turned off.
+            apply_text_normalization: Text normalizer mode (auto, on, off)
+            output_format: Format (mp3_22050_32, mp3_44100_128, ulaw_8000, etc.)
+        
         Returns:
             Generator yielding audio chunks
         """
         if not voice_id:
             voice_id = self.get_default_voice()
         
-        return self.client.text_to_speech.convert(
+        return self._stream(
+            text=text,
             voice_id=voice_id,
             model_id=model_id,
-            text=text,
-            output_format="mp3_44100_128",
+            output_format=output_format,
+            optimize_streaming_latency=optimize_streaming_latency,
+            apply_text_normalization=apply_text_normalization,
         )
+    
+    def text_to_speech_telephony(self, text: str, voice_id: str = None):
+        """Stream 8kHz mu-law audio, the native format for phone lines (e.g. Twilio).
+        
+        Returns:
+            Generator yielding audio chunks
+        """
+        return self.text_to_speech_streaming(text, voice_id=voice_id, output_format="ulaw_8000")
 
 
 # === USAGE EXAMPLES ===
 
 if __name__ == "__main__":
-    # Initialize
-    tts = ElevenLabsTTS()
+    # Initialize (first call is immediate, so skip the warm-up)
+    tts = ElevenLabsTTS(eager_connect=False)
     
     # Example 1: Simple text-to-speech
     tts.text_to_speech(
@@ -123,3 +512,10 @@ if __name__ == "__main__":
     # for chunk in stream:
     #     # Send chunk to audio player or save incrementally
     #     pass
+    
+    # Example 5: Speak LLM output while it is still being generated
+    # async def speak(llm_tokens):
+    #     sentences = SentenceBuffer().aiter_sentences(llm_tokens)
+    #     async for chunk in tts.text_to_speech_ws_stream(sentences):
+    #         # Send chunk to audio player
+    #         pass
@@ -4,34 +4,68 @@ Shows how to use OpenAI Audio + ElevenLabs together for your projects.
 """
 
 import os
+import asyncio
+import aiofiles
+from concurrent.futures import ThreadPoolExecutor
 from openai_audio import OpenAIAudio
-from elevenlabs_tts import ElevenLabsTTS
+from elevenlabs_tts import ElevenLabsTTS, SentenceBuffer
 from openai import OpenAI
 
 
+def speak_streamed_reply(response, tts: ElevenLabsTTS, output_path: str) -> str:
+    """Speak a streaming chat completion sentence by sentence.
+    
+    Each sentence is sent to TTS as soon as GPT finishes it, so speech is
+    synthesized while the rest of the answer is still being generated.
+    
+    Returns:
+        The full answer text
+    """
+    buffer = SentenceBuffer()
+    answer = []
+    
+    with open(output_path, "wb") as f:
+        def speak(sentences):
+            for sentence in sentences:
+                for chunk in tts.text_to_speech_streaming(sentence):
+                    f.write(chunk)
+        
+        for event in response:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content or ""
+            answer.append(delta)
+            speak(buffer.feed(delta))
+        speak(buffer.flush())
+    
+    return "".join(answer)
+
+
 def example_1_voice_assistant():
     """Voice assistant: Listen -> Think -> Speak (OpenAI STT + GPT + ElevenLabs TTS)"""
     print("\n=== Example 1: Voice Assistant ===")
     
-    # Initialize
-    audio = OpenAIAudio()
+    # Initialize - TTS first, so its warm-up runs during transcription and GPT.
+    # The transcription starts right away, so warming its client would
+    # only open a second connection.
     tts = ElevenLabsTTS()
     gpt = OpenAI()
+    audio = OpenAIAudio(eager_connect=False)
     
     # Step 1: Transcribe user audio
     user_question = audio.transcribe("user_input.wav")
     print(f"User said: {user_question}")
     
-    # Step 2: Get AI response
+    # Step 2: Get AI response (streamed)
     response = gpt.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[{"role": "user", "content": user_question}]
+        messages=[{"role": "user", "content": user_question}],
+        stream=True
     )
-    answer = response.choices[0].message.content
-    print(f"Assistant: {answer}")
     
-    # Step 3: Speak with ElevenLabs premium voice
-    tts.text_to_speech(answer, "assistant_reply.mp3")
+    # Step 3: Speak with ElevenLabs premium voice as each sentence completes
+    answer = speak_streamed_reply(response, tts, "assistant_reply.mp3")
+    print(f"Assistant: {answer}")
     print("✓ Response saved to assistant_reply.mp3")
 
 
@@ -39,9 +73,10 @@ def example_2_healthaide():
     """HealthAIde: Medical assistant with premium voice"""
     print("\n=== Example 2: HealthAIde Medical Assistant ===")
     
-    audio = OpenAIAudio()
+    # TTS first, so its warm-up runs during transcription and GPT
     tts = ElevenLabsTTS()
     gpt = OpenAI()
+    audio = OpenAIAudio(eager_connect=False)
     
     # Transcribe patient question
     patient_audio = audio.transcribe("patient_question.wav")
@@ -58,13 +93,12 @@ def example_2_healthaide():
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": patient_audio}
-        ]
+        ],
+        stream=True
     )
     
-    answer = response.choices[0].message.content
-    
     # Use ElevenLabs for professional medical voice
-    tts.text_to_speech(answer, "health_response.mp3")
+    speak_streamed_reply(response, tts, "health_response.mp3")
     print(f"✓ Health info ready: health_response.mp3")
 
 
@@ -72,18 +106,26 @@ def example_3_compare_voices():
     """Compare OpenAI vs ElevenLabs TTS"""
     print("\n=== Example 3: Voice Comparison ===")
     
-    audio = OpenAIAudio()
-    tts = ElevenLabsTTS()
+    # Both clients are used immediately; a warm-up would race the real
+    # call and open a second connection instead of saving a handshake
+    audio = OpenAIAudio(eager_connect=False)
+    tts = ElevenLabsTTS(eager_connect=False)
     
     text = "Welcome to your personalized audio experience. This is a test of voice quality."
     
-    # OpenAI TTS (fast, good quality)
-    audio.text_to_speech(text, "openai_voice.wav", voice="coral")
-    print("✓ OpenAI voice saved")
-    
-    # ElevenLabs TTS (premium, character voices)
-    tts.text_to_speech(text, "elevenlabs_voice.mp3")
-    print("✓ ElevenLabs voice saved")
+    # Both providers run at the same time - they hit different hosts
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # OpenAI TTS (fast, good quality)
+        openai_future = executor.submit(
+            audio.text_to_speech, text, "openai_voice.opus", voice="coral", response_format="opus"
+        )
+        # ElevenLabs TTS (premium, character voices)
+        elevenlabs_future = executor.submit(tts.text_to_speech, text, "elevenlabs_voice.mp3")
+        
+        openai_future.result()
+        print("✓ OpenAI voice saved")
+        elevenlabs_future.result()
+        print("✓ ElevenLabs voice saved")
     
     print("\nCompare both files to choose what works for your app!")
 
@@ -110,25 +152,37 @@ def example_4_storyspark_narration():
     print("✓ Story narration ready for QR code")
 
 
-def example_5_batch_processing():
-    """Process multiple files efficiently"""
+async def example_5_batch_processing():
+    """Process multiple files concurrently"""
     print("\n=== Example 5: Batch Audio Processing ===")
     
-    audio = OpenAIAudio()
+    # The first transcription starts right away, so skip the warm-up
+    audio = OpenAIAudio(eager_connect=False)
     
     audio_files = ["interview1.mp3", "interview2.mp3", "interview3.mp3"]
     
-    for i, file in enumerate(audio_files, 1):
+    found = []
+    for file in audio_files:
         if os.path.exists(file):
-            transcript = audio.transcribe(file)
-            
-            # Save transcript
-            with open(f"transcript_{i}.txt", "w") as f:
-                f.write(transcript)
-            
-            print(f"✓ Processed {file}")
+            found.append(file)
         else:
             print(f"⚠ Skipped {file} (not found)")
+    
+    # Max 8 transcriptions in flight; each transcript is written as soon as
+    # it arrives, so file writes overlap with the remaining network calls
+    semaphore = asyncio.Semaphore(8)
+    
+    async def process(i, file):
+        async with semaphore:
+            transcript = await audio.transcribe_async(file)
+        
+        # Save transcript
+        async with aiofiles.open(f"transcript_{i}.txt", "w") as f:
+            await f.write(transcript)
+        
+        print(f"✓ Processed {file}")
+    
+    await asyncio.gather(*[process(i, file) for i, file in enumerate(found, 1)])
 
 
 if __name__ == "__main__":
@@ -142,7 +196,7 @@ if __name__ == "__main__":
     # example_2_healthaide()
     example_3_compare_voices()
     # example_4_storyspark_narration()
-    # example_5_batch_processing()
+    # asyncio.run(example_5_batch_processing())
     
     print("\n✓ All examples complete!")
     print("\nNext steps:")
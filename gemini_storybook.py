@@ -5,13 +5,50 @@ Based on Google's Storybook Gem functionality.
 """
 
 import os
-import json
+import msgspec
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from typing import List, Dict, Optional
+from typing_extensions import TypedDict
 import base64
 from pathlib import Path
 
 
+# Instructions common to every storybook request, set once on the models
+SYSTEM_INSTRUCTION = """
+You are a children's storybook writer and illustrator. Create engaging, age-appropriate stories.
+Maintain consistent characters and plot progression.
+
+Every image generation prompt you write is a single, concise prompt (2-3 sentences) that:
+- Captures the key scene/moment
+- Maintains character consistency
+- Specifies the artistic style
+- Is suitable for children's book illustration
+"""
+
+_STYLE_INSTRUCTIONS: Dict[str, str] = {
+    "watercolor": "soft watercolor painting, gentle brush strokes, pastel colors",
+    "pixel art": "8-bit pixel art style, retro gaming aesthetic, vibrant colors",
+    "comics": "comic book illustration, bold lines, dynamic action poses",
+    "claymation": "claymation style, clay figures, tactile textures",
+    "crochet": "crochet/yarn art style, soft textile textures",
+    "coloring book": "black and white line art, coloring book style"
+}
+
+_DEFAULT_STYLE = "high-quality children's book illustration"
+
+
+class StoryPage(TypedDict):
+    page_num: int
+    text: str
+    image_prompt: str
+
+
+class StoryResponse(TypedDict):
+    title: str
+    pages: List[StoryPage]
+
+
 class GeminiStorybook:
     """Generate illustrated storybooks like the official Gemini Storybook Gem."""
     
@@ -20,8 +57,8 @@ class GeminiStorybook:
         genai.configure(api_key=self.api_key)
         
         # Use Gemini 2.0 Flash for fast, high-quality generation
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        self.image_model = genai.GenerativeModel('gemini-2.0-flash-exp')  # For image prompt generation
+        self.model = genai.GenerativeModel('gemini-2.0-flash-exp', system_instruction=SYSTEM_INSTRUCTION)
+        self.image_model = genai.GenerativeModel('gemini-2.0-flash-exp', system_instruction=SYSTEM_INSTRUCTION)  # For image prompt generation
     
     def generate_story(self, prompt: str, pages: int = 10, style: str = "watercolor") -> Dict:
         """Generate complete storybook with text and image prompts.
@@ -36,103 +73,167 @@ class GeminiStorybook:
         """
         print(f"\n🎨 Generating {pages}-page storybook...")
         
-        # Step 1: Generate story structure and text
-        story_data = self._generate_story_text(prompt, pages)
-        
-        # Step 2: Generate image prompts for each page
-        story_data = self._generate_image_prompts(story_data, style)
+        # Story text and image prompts come back from a single request
+        story_data = self._generate_story_text(prompt, pages, style)
         
         print("✓ Storybook generated!")
         return story_data
     
-    def _generate_story_text(self, prompt: str, pages: int) -> Dict:
-        """Generate story title and text for each page."""
+    def _generate_story_text(self, prompt: str, pages: int, style: str = "watercolor") -> Dict:
+        """Generate story title, text and image prompt for each page."""
         
-        system_instruction = f"""
-You are a children's storybook writer. Create engaging, age-appropriate stories.
-
+        style_desc = self._style_description(style)
+        
+        story_request = f"""
 Generate a {pages}-page storybook based on the user's prompt.
 Each page should have 2-3 sentences suitable for children.
-Maintain consistent characters and plot progression.
+For each page also write an image generation prompt in this style: {style_desc}
 
 Return ONLY valid JSON in this exact format:
 {{
   "title": "Story Title",
   "pages": [
-    {{"page_num": 1, "text": "Page 1 text here..."}},
-    {{"page_num": 2, "text": "Page 2 text here..."}}
+    {{"page_num": 1, "text": "Page 1 text here...", "image_prompt": "Page 1 image prompt..."}},
+    {{"page_num": 2, "text": "Page 2 text here...", "image_prompt": "Page 2 image prompt..."}}
   ]
 }}
 """
         
-        full_prompt = f"{system_instruction}\n\nUser story prompt: {prompt}"
+        full_prompt = f"{story_request}\n\nUser story prompt: {prompt}"
         
-        response = self.model.generate_content(full_prompt)
+        response = self.model.generate_content(
+            full_prompt,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=StoryResponse,
+            ),
+        )
         
-        # Parse JSON response
+        # response.text raises ValueError if the response was blocked or empty
         try:
-            # Extract JSON from markdown code blocks if present
             text = response.text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
-            
-            story_data = json.loads(text)
+        except ValueError as e:
+            print(f"No story returned: {e}")
+            return self._fallback_story(pages)
+        
+        # Parse and validate JSON response in one pass
+        try:
+            story_data = msgspec.json.decode(text, type=StoryResponse)
             print(f"✓ Story text generated: {story_data['title']}")
             return story_data
-        except Exception as e:
+        except msgspec.DecodeError as e:
             print(f"Error parsing story: {e}")
-            # Fallback structure
-            return {
-                "title": "A Magical Story",
-                "pages": [{"page_num": i+1, "text": f"Page {i+1} of your story..."} for i in range(pages)]
-            }
+            return self._fallback_story(pages)
     
-    def _generate_image_prompts(self, story_data: Dict, style: str) -> Dict:
-        """Generate image prompts for each page based on story text."""
+    def _fallback_story(self, pages: int) -> Dict:
+        """Placeholder story used when Gemini returns nothing usable."""
+        return {
+            "title": "A Magical Story",
+            "pages": [
+                {"page_num": i+1, "text": f"Page {i+1} of your story...", "image_prompt": ""}
+                for i in range(pages)
+            ]
+        }
+    
+    def _style_description(self, style: str) -> str:
+        """Map an illustration style name to its prompt description."""
+        return _STYLE_INSTRUCTIONS.get(style.lower(), _DEFAULT_STYLE)
+    
+    def restyle_image_prompts(self, story_data: Dict, style: str, batch_size: int = 5) -> Dict:
+        """Regenerate image prompts for each page in a different style.
+        
+        generate_story() already returns image prompts; use this to produce
+        prompts in another style for an existing story. Pages are sent
+        in batches of ``batch_size`` per request.
+        
+        Args:
+            story_data: Story returned by generate_story()
+            style: Illustration style (watercolor, pixel art, comics, claymation, crochet, coloring book)
+            batch_size: Pages per Gemini request
+        
+        Returns:
+            The same story_data with updated image prompts
+        """
         
         print("✓ Generating image prompts...")
         
-        style_instructions = {
-            "watercolor": "soft watercolor painting, gentle brush strokes, pastel colors",
-            "pixel art": "8-bit pixel art style, retro gaming aesthetic, vibrant colors",
-            "comics": "comic book illustration, bold lines, dynamic action poses",
-            "claymation": "claymation style, clay figures, tactile textures",
-            "crochet": "crochet/yarn art style, soft textile textures",
-            "coloring book": "black and white line art, coloring book style"
-        }
+        style_desc = self._style_description(style)
         
-        style_desc = style_instructions.get(style.lower(), "high-quality children's book illustration")
+        pages = story_data["pages"]
+        batches = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+        if batches:
+            # Each batch is an independent request, so fan them out
+            with ThreadPoolExecutor(max_workers=min(10, len(batches))) as executor:
+                results = executor.map(
+                    lambda batch: self._image_prompts_for_batch(batch, style_desc, story_data["title"]),
+                    batches
+                )
+                for batch, prompts in zip(batches, results):
+                    for page, image_prompt in zip(batch, prompts):
+                        page["image_prompt"] = image_prompt
+        
+        print("✓ Image prompts generated")
+        return story_data
+    
+    def _image_prompts_for_batch(self, batch: List[Dict], style_desc: str, title: str) -> List[str]:
+        """Generate image prompts for several pages in one request.
         
-        for page in story_data["pages"]:
-            # Generate image prompt for this page
-            image_prompt_request = f"""
+        Falls back to one request per page if the response doesn't contain
+        exactly one prompt per page.
+        """
+        page_texts = "\n".join(
+            f"{i}. \"{page['text']}\"" for i, page in enumerate(batch, 1)
+        )
+        batch_prompt = f"""
+Given the following {len(batch)} page texts from the book '{title}', produce a JSON array
+of {len(batch)} image generation prompts, one per page, in order.
+
+Page texts:
+{page_texts}
+
+Style: {style_desc}
+
+Return ONLY the JSON array of strings.
+"""
+        
+        response = self.image_model.generate_content(
+            batch_prompt,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json",
+                # The SDK only accepts the builtin generic, not typing.List
+                response_schema=list[str],
+            ),
+        )
+        
+        # response.text raises ValueError if the response was blocked or empty
+        try:
+            prompts = msgspec.json.decode(response.text, type=list[str])
+        except (ValueError, msgspec.DecodeError):
+            prompts = None
+        
+        if prompts is None or len(prompts) != len(batch):
+            return [self._image_prompt_for_page(page, style_desc, title) for page in batch]
+        return [prompt.strip() for prompt in prompts]
+    
+    def _image_prompt_for_page(self, page: Dict, style_desc: str, title: str) -> str:
+        """Generate the image prompt for a single page."""
+        image_prompt_request = f"""
 Based on this story page, create a detailed image generation prompt.
 
 Page text: "{page['text']}"
 Style: {style_desc}
-Title: {story_data['title']}
-
-Generate a single, concise image prompt (2-3 sentences) that:
-- Captures the key scene/moment
-- Maintains character consistency
-- Specifies the artistic style
-- Is suitable for children's book illustration
+Title: {title}
 
 Return ONLY the image prompt text, no extra commentary.
 """
-            
-            response = self.image_model.generate_content(image_prompt_request)
-            page["image_prompt"] = response.text.strip()
         
-        print("✓ Image prompts generated")
-        return story_data
+        response = self.image_model.generate_content(image_prompt_request)
+        return response.text.strip()
     
     def save_storybook(self, story_data: Dict, output_path: str = "storybook.json"):
         """Save storybook data to JSON file."""
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(story_data, f, indent=2, ensure_ascii=False)
+        with open(output_path, "wb") as f:
+            f.write(msgspec.json.format(msgspec.json.encode(story_data), indent=2))
         print(f"✓ Saved to {output_path}")
     
     def generate_with_images(self, story_data: Dict, image_generator_func) -> Dict:
@@ -184,6 +285,10 @@ if __name__ == "__main__":
         print(f"  Text: {page['text']}")
         print(f"  Image prompt: {page['image_prompt'][:80]}...")
     
+    # Example 2: Re-style the same story without rewriting it
+    story = storybook.restyle_image_prompts(story, style="pixel art")
+    storybook.save_storybook(story, "dragon_story_pixel_art.json")
+    
     print("\n💡 Next steps:")
     print("1. Use image_prompts with Imagen, Stable Diffusion, or DALL-E")
     print("2. Integrate with your KDP pipeline")
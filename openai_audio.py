@@ -4,17 +4,52 @@ For HealthAIde, StorySpark, and your other projects.
 """
 
 import os
+import asyncio
+import threading
 from pathlib import Path
 from openai import OpenAI, AsyncOpenAI
 
 
 class OpenAIAudio:
-    """Unified OpenAI Audio handler for transcription and TTS."""
+    """Unified OpenAI Audio handler for transcription and TTS.
     
-    def __init__(self, api_key: str = None):
+    The sync and async clients keep their connection pools alive between
+    calls, so reuse one instance across requests. With eager_connect, build
+    it well before the first call so the warm-up can finish in time.
+    """
+    
+    def __init__(self, api_key: str = None, eager_connect: bool = True):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.client = OpenAI(api_key=self.api_key)
         self.async_client = AsyncOpenAI(api_key=self.api_key)
+        self._warm_up_task = None
+        
+        if eager_connect:
+            # Open a connection (DNS + TLS) off the critical path, on the
+            # client this context will use: async inside an event loop,
+            # sync otherwise
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                self._warm_up_task = loop.create_task(self._warm_up_async())
+            else:
+                threading.Thread(target=self._warm_up, daemon=True).start()
+    
+    def _warm_up(self):
+        """Issue a cheap request so the sync connection pool is ready."""
+        try:
+            self.client.models.list()
+        except Exception:
+            pass
+    
+    async def _warm_up_async(self):
+        """Issue a cheap request so the async connection pool is ready."""
+        try:
+            await self.async_client.models.list()
+        except Exception:
+            pass
     
     # === TRANSCRIPTION (Speech-to-Text) ===
     
@@ -44,15 +79,39 @@ class OpenAIAudio:
             )
         return response.text
     
+    async def transcribe_batch(
+        self,
+        audio_paths: list,
+        model: str = "gpt-4o-transcribe",
+        concurrency: int = 8
+    ) -> list:
+        """Transcribe several audio files concurrently.
+        
+        Args:
+            audio_paths: Paths to audio files
+            model: Model to use (gpt-4o-transcribe or gpt-4o-mini-transcribe)
+            concurrency: Max requests in flight (keeps under rate limits)
+        
+        Returns:
+            Transcribed texts, in the same order as audio_paths
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _transcribe(path):
+            async with semaphore:
+                return await self.transcribe_async(path, model=model)
+        
+        return await asyncio.gather(*[_transcribe(p) for p in audio_paths])
+    
     # === TEXT-TO-SPEECH ===
     
     def text_to_speech(
         self,
         text: str,
-        output_path: str = "output.wav",
+        output_path: str = "output.opus",
         voice: str = "coral",
         model: str = "gpt-4o-mini-tts",
-        response_format: str = "wav"
+        response_format: str = "opus"
     ) -> str:
         """Convert text to speech audio file.
         
@@ -61,43 +120,40 @@ class OpenAIAudio:
             output_path: Where to save the audio file
             voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer, coral, etc.)
             model: TTS model (gpt-4o-mini-tts or gpt-4o-tts)
-            response_format: Output format (mp3, opus, aac, flac, wav, pcm)
+            response_format: Output format (mp3, opus, aac, flac, wav, pcm).
+                opus is compact for downloads; use pcm (raw 24kHz 16-bit mono)
+                to feed an audio sink directly without decoding.
         
         Returns:
             Path to saved audio file
         """
-        response = self.client.audio.speech.create(
+        # Stream audio to file so memory stays flat for long narrations
+        with self.client.audio.speech.with_streaming_response.create(
             model=model,
             voice=voice,
             input=text,
             response_format=response_format
-        )
-        
-        # Write audio to file
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        ) as response:
+            response.stream_to_file(output_path)
         
         return output_path
     
     async def text_to_speech_async(
         self,
         text: str,
-        output_path: str = "output.wav",
+        output_path: str = "output.opus",
         voice: str = "coral",
         model: str = "gpt-4o-mini-tts",
-        response_format: str = "wav"
+        response_format: str = "opus"
     ) -> str:
         """Async version of text_to_speech."""
-        response = await self.async_client.audio.speech.create(
+        async with self.async_client.audio.speech.with_streaming_response.create(
             model=model,
             voice=voice,
             input=text,
             response_format=response_format
-        )
-        
-        content = await response.aread()
-        with open(output_path, "wb") as f:
-            f.write(content)
+        ) as response:
+            await response.stream_to_file(output_path)
         
         return output_path
 
@@ -105,8 +161,8 @@ class OpenAIAudio:
 # === USAGE EXAMPLES ===
 
 if __name__ == "__main__":
-    # Initialize
-    audio = OpenAIAudio()
+    # Initialize (first call is immediate, so skip the warm-up)
+    audio = OpenAIAudio(eager_connect=False)
     
     # Example 1: Transcribe audio
     text = audio.transcribe("interview.mp3")
@@ -115,7 +171,7 @@ if __name__ == "__main__":
     # Example 2: Generate speech
     audio.text_to_speech(
         text="Welcome to HealthAIde. How can I help you today?",
-        output_path="greeting.wav",
+        output_path="greeting.opus",
         voice="coral"
     )
     
@@ -126,4 +182,4 @@ if __name__ == "__main__":
     # Process with your GPT logic here
     answer = f"You said: {transcription}"
     
-    audio.text_to_speech(answer, "response.wav")
+    audio.text_to_speech(answer, "response.opus")